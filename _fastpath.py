@@ -0,0 +1,384 @@
+"""
+Per-file hot path of the ORC info collector.
+
+These functions run once per input file: S3 path parsing, decoding of the
+ORC file tail, and result assembly. They are fully
+type-annotated so the module can be compiled with mypyc (see setup.py);
+without a compiler the pure-Python module is imported unchanged.
+"""
+
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pyarrow as pa  # type: ignore[import-untyped]
+
+# CompressionKind values from orc_proto.proto. LZO is the only codec that
+# cannot be decoded locally.
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_SNAPPY = 2
+COMPRESSION_LZO = 3
+COMPRESSION_LZ4 = 4
+COMPRESSION_ZSTD = 5
+
+# Magic number opening every zstd frame, little-endian
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Size of the initial ranged read at the end of the file. This covers the
+# postscript and footer of almost every ORC file; larger footers are re-read.
+TAIL_READ_SIZE = 64 * 1024
+
+# A decoded protobuf field value: varints are ints, everything else is raw bytes
+FieldValue = Union[int, memoryview]
+
+
+def parse_s3_path(s3_path: str) -> Tuple[str, str]:
+    """Parse an S3 path into bucket and key components."""
+    # Plain string splitting; urlparse is comparatively slow for large manifests
+    if not s3_path.startswith('s3://'):
+        raise ValueError(f"Not an S3 path: {s3_path}")
+
+    slash = s3_path.find('/', 5)
+    if slash < 0:
+        return s3_path[5:], ''
+
+    bucket = s3_path[5:slash]
+    key = s3_path[slash + 1:].lstrip('/')
+    return bucket, key
+
+
+def _read_varint(buf: memoryview, pos: int) -> Tuple[int, int]:
+    """Decode a base-128 varint starting at pos, returning (value, new_pos)."""
+    result = 0
+    shift = 0
+    while True:
+        byte: int = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_proto_fields(buf: memoryview) -> Iterator[Tuple[int, FieldValue]]:
+    """Yield (field_number, value) for each field of a serialized protobuf message."""
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        tag, pos = _read_varint(buf, pos)
+        field_number, wire_type = tag >> 3, tag & 0x7
+        value: FieldValue
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire_type == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type: {wire_type}")
+        yield field_number, value
+
+
+def _decode_zigzag(value: int) -> int:
+    """Decode a protobuf sint64 value."""
+    return (value >> 1) ^ -(value & 1)
+
+
+def _parse_postscript(tail: memoryview) -> Dict[str, int]:
+    """
+    Parse the ORC postscript from the last bytes of a file.
+
+    The final byte of an ORC file holds the postscript length, and the
+    postscript immediately precedes it.
+
+    Returns:
+        dict: postscript_length, footer_length, metadata_length and
+        compression kind
+    """
+    if not len(tail) or tail[-1] + 1 > len(tail):
+        raise ValueError("File size too small")
+    postscript_length: int = tail[-1]
+
+    postscript = {
+        'postscript_length': postscript_length,
+        'footer_length': 0,
+        'metadata_length': 0,
+        'compression': COMPRESSION_NONE
+    }
+    magic: Optional[bytes] = None
+    for field_number, value in _iter_proto_fields(tail[-1 - postscript_length:-1]):
+        if isinstance(value, int):
+            if field_number == 1:
+                postscript['footer_length'] = value
+            elif field_number == 2:
+                postscript['compression'] = value
+            elif field_number == 5:
+                postscript['metadata_length'] = value
+        elif field_number == 8000:
+            magic = bytes(value)
+
+    if magic != b'ORC':
+        raise ValueError("Not an ORC file: missing postscript magic")
+    return postscript
+
+
+def _decompress_lz4_block(src: memoryview) -> bytes:
+    """Decode a raw LZ4 block, whose decompressed size is not recorded."""
+    out = bytearray()
+    pos = 0
+    end = len(src)
+    while pos < end:
+        token: int = src[pos]
+        pos += 1
+
+        literal_length = token >> 4
+        if literal_length == 15:
+            while True:
+                extra: int = src[pos]
+                pos += 1
+                literal_length += extra
+                if extra != 255:
+                    break
+        out += src[pos:pos + literal_length]
+        pos += literal_length
+        if pos >= end:
+            # The last sequence holds literals only
+            break
+
+        offset: int = src[pos] | (src[pos + 1] << 8)
+        pos += 2
+        match_length = (token & 0xf) + 4
+        if match_length == 19:
+            while True:
+                extra = src[pos]
+                pos += 1
+                match_length += extra
+                if extra != 255:
+                    break
+        if offset == 0 or offset > len(out):
+            raise ValueError("Corrupt LZ4 block")
+
+        start = len(out) - offset
+        if match_length <= offset:
+            out += out[start:start + match_length]
+        else:
+            # Overlapping match: the copied bytes repeat with period offset
+            for i in range(match_length):
+                out.append(out[start + i])
+    return bytes(out)
+
+
+def _zstd_content_size(frame: memoryview) -> Optional[int]:
+    """Return the decompressed size recorded in a zstd frame header, if any."""
+    if len(frame) < 6 or bytes(frame[:4]) != ZSTD_MAGIC:
+        raise ValueError("Not a zstd frame")
+
+    descriptor: int = frame[4]
+    single_segment = (descriptor >> 5) & 1
+    size_flag = descriptor >> 6
+    pos = 5 + (0 if single_segment else 1) + (0, 1, 2, 4)[descriptor & 3]
+    size_bytes = (single_segment, 2, 4, 8)[size_flag]
+    if not size_bytes:
+        return None
+
+    size = int.from_bytes(bytes(frame[pos:pos + size_bytes]), 'little')
+    return size + 256 if size_bytes == 2 else size
+
+
+def _decompress_chunk(chunk: memoryview, compression: int) -> Optional[bytes]:
+    """Decompress one ORC compression chunk, or return None if it cannot be decoded locally."""
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(chunk, -15)
+    if compression == COMPRESSION_LZ4:
+        return _decompress_lz4_block(chunk)
+
+    size: Optional[int]
+    if compression == COMPRESSION_SNAPPY:
+        # Snappy blocks start with their decompressed size as a varint
+        size, _ = _read_varint(chunk, 0)
+        codec = 'snappy'
+    elif compression == COMPRESSION_ZSTD:
+        size = _zstd_content_size(chunk)
+        codec = 'zstd'
+    else:
+        return None
+    if size is None:
+        return None
+
+    data: bytes = pa.decompress(chunk, decompressed_size=size, codec=codec, asbytes=True)
+    return data
+
+
+def _decompress(data: memoryview, compression: int) -> Optional[memoryview]:
+    """
+    Decompress an ORC metadata section made of compression chunks.
+
+    Returns None if the codec cannot be decoded locally.
+    """
+    if compression == COMPRESSION_NONE:
+        return data
+
+    chunks: List[bytes] = []
+    pos = 0
+    while pos < len(data):
+        # 3-byte little-endian header: chunk length << 1 | is_original
+        header: int = data[pos] | (data[pos + 1] << 8) | (data[pos + 2] << 16)
+        pos += 3
+        length = header >> 1
+        chunk = data[pos:pos + length]
+        pos += length
+        if header & 1:
+            chunks.append(bytes(chunk))
+            continue
+
+        decompressed = _decompress_chunk(chunk, compression)
+        if decompressed is None:
+            return None
+        chunks.append(decompressed)
+    return memoryview(b''.join(chunks))
+
+
+def _parse_top_level_columns(root_type: memoryview) -> List[int]:
+    """Return the column ids of the root struct's subtypes."""
+    columns: List[int] = []
+    for field_number, value in _iter_proto_fields(root_type):
+        if field_number != 2:
+            continue
+        if isinstance(value, int):
+            columns.append(value)
+        else:
+            # Packed repeated field
+            pos = 0
+            while pos < len(value):
+                column_id, pos = _read_varint(value, pos)
+                columns.append(column_id)
+    return columns
+
+
+def _column_raw_length(statistics: memoryview) -> int:
+    """Return the summed string/binary length recorded in column statistics."""
+    raw_length = 0
+    for field_number, value in _iter_proto_fields(statistics):
+        # stringStatistics.sum (field 3) or binaryStatistics.sum (field 1)
+        if field_number == 4:
+            sum_field = 3
+        elif field_number == 8:
+            sum_field = 1
+        else:
+            continue
+        if isinstance(value, int):
+            continue
+        for sub_field, sub_value in _iter_proto_fields(value):
+            if sub_field == sum_field and isinstance(sub_value, int):
+                raw_length += _decode_zigzag(sub_value)
+    return raw_length
+
+
+def _parse_footer(footer: memoryview, include_raw_length: bool = False) -> Dict[str, Optional[int]]:
+    """
+    Parse the ORC file footer.
+
+    Returns:
+        dict: num_stripes, content_length and raw_length, where raw_length is
+        the summed string/binary length of the top-level columns, or None
+        unless include_raw_length is set
+    """
+    num_stripes = 0
+    content_length = 0
+    top_level_columns: Optional[List[int]] = None
+    statistics: List[memoryview] = []
+    for field_number, value in _iter_proto_fields(footer):
+        if isinstance(value, int):
+            if field_number == 2:
+                content_length = value
+        elif field_number == 3:
+            num_stripes += 1
+        elif not include_raw_length:
+            continue
+        elif field_number == 4 and top_level_columns is None:
+            # The first type is the root struct; its subtypes are the top-level columns
+            top_level_columns = _parse_top_level_columns(value)
+        elif field_number == 7:
+            statistics.append(value)
+
+    raw_length: Optional[int] = None
+    if include_raw_length:
+        raw_length = 0
+        for column_id in top_level_columns or []:
+            if column_id < len(statistics):
+                raw_length += _column_raw_length(statistics[column_id])
+
+    return {
+        'num_stripes': num_stripes,
+        'content_length': content_length,
+        'raw_length': raw_length
+    }
+
+
+def parse_stripe_row_counts(footer: memoryview) -> List[int]:
+    """Return the number of rows in each stripe from a decompressed ORC footer."""
+    row_counts: List[int] = []
+    for field_number, stripe in _iter_proto_fields(footer):
+        if field_number != 3 or isinstance(stripe, int):
+            continue
+        # StripeInformation.numberOfRows is field 5
+        num_rows = 0
+        for stripe_field, stripe_value in _iter_proto_fields(stripe):
+            if stripe_field == 5 and isinstance(stripe_value, int):
+                num_rows = stripe_value
+        row_counts.append(num_rows)
+    return row_counts
+
+
+class FileTail:
+    """The postscript and footer read from the end of an ORC file."""
+
+    def __init__(self, file_length: int, postscript: Dict[str, int], buffer: memoryview) -> None:
+        self.file_length = file_length
+        self.postscript = postscript
+        # Last bytes of the file, covering at least the footer and postscript
+        self.buffer = buffer
+
+    def footer(self) -> Optional[memoryview]:
+        """Return the decompressed footer, or None if its codec cannot be decoded locally."""
+        footer_end = len(self.buffer) - 1 - self.postscript['postscript_length']
+        return _decompress(self.buffer[footer_end - self.postscript['footer_length']:footer_end],
+                           self.postscript['compression'])
+
+
+def read_file_tail(in_file: Any, tail_read_size: int = TAIL_READ_SIZE) -> FileTail:
+    """
+    Read the ORC postscript and footer of an open file.
+
+    in_file is a PyArrow random access file. One ranged read of up to
+    tail_read_size bytes at the end of the file is usually enough; a larger
+    footer is read again at its exact size.
+    """
+    file_length: int = in_file.size()
+    tail_size = min(tail_read_size, file_length)
+    tail = memoryview(in_file.read_at(tail_size, file_length - tail_size))
+    postscript = _parse_postscript(tail)
+
+    needed = 1 + postscript['postscript_length'] + postscript['footer_length']
+    if needed > file_length:
+        raise ValueError("Footer length exceeds file size")
+    if needed > len(tail):
+        tail = memoryview(in_file.read_at(needed, file_length - needed))
+
+    return FileTail(file_length, postscript, tail)
+
+
+def _build_result(s3_path: str, metadata: Dict[str, Optional[int]]) -> Dict[str, Union[str, int, None]]:
+    """Combine an S3 path and its ORC metadata into an output row."""
+    return {
+        'file_path': s3_path,
+        'file_length': metadata['file_length'],
+        'num_stripes': metadata['num_stripes'],
+        'raw_length': metadata['raw_length']
+    }
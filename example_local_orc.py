@@ -11,6 +11,7 @@ This script:
 Requirements:
 - pyarrow
 - pandas
+- _fastpath.py from this repository, for reading the ORC footer
 """
 
 import os
@@ -20,6 +21,8 @@ import pyarrow.fs as fs
 import pandas as pd
 import tempfile
 
+from _fastpath import read_file_tail, parse_stripe_row_counts
+
 
 def create_sample_orc_file(path, num_rows=1000):
     """Create a sample ORC file with the specified number of rows."""
@@ -41,8 +44,12 @@ def create_sample_orc_file(path, num_rows=1000):
     print(f"Created sample ORC file at {path} with {num_rows} rows")
 
 
-def analyze_local_orc_file(path):
-    """Analyze a local ORC file and print information about it using PyArrow's filesystem interface."""
+def analyze_local_orc_file(path, include_content_length=False):
+    """
+    Analyze a local ORC file and print information about it using PyArrow's filesystem interface.
+    
+    The content length is only looked up when include_content_length is set.
+    """
     # Create a local filesystem
     local_fs = fs.LocalFileSystem()
     
@@ -51,26 +58,28 @@ def analyze_local_orc_file(path):
     file_size = file_info.size
     
     # Open the ORC file using PyArrow's filesystem interface
-    orc_file = orc.ORCFile(path, filesystem=local_fs)
+    orc_file = orc.ORCFile(local_fs.open_input_file(path))
     
     # Get number of stripes
     num_stripes = orc_file.nstripes
     
-    # Get raw data size from ORC file metadata
-    raw_data_size = get_raw_data_size(orc_file)
-    
     # Print information
     print("\nORC File Information:")
     print(f"File path: {path}")
     print(f"File size (from PyArrow fs): {file_size} bytes")
     print(f"Number of stripes: {num_stripes}")
-    print(f"Raw data size: {raw_data_size}")
+    if include_content_length:
+        # Get the stripe content length from the ORC footer
+        print(f"Content length (stripe bytes): {get_content_length(orc_file)}")
     
-    # Print stripe information
+    # Print stripe information from the footer instead of decoding every stripe
     print("\nStripe Information:")
-    for i in range(num_stripes):
-        stripe = orc_file.read_stripe(i)
-        print(f"Stripe {i}: {len(stripe)} rows")
+    row_counts = get_stripe_row_counts(local_fs, path)
+    if row_counts is None:
+        # The footer codec cannot be decoded locally; read each stripe instead
+        row_counts = [orc_file.read_stripe(i).num_rows for i in range(num_stripes)]
+    for i, num_rows in enumerate(row_counts):
+        print(f"Stripe {i}: {num_rows} rows")
     
     # Read the schema
     print("\nSchema:")
@@ -79,32 +88,35 @@ def analyze_local_orc_file(path):
         print(f"  {i}: {field.name} ({field.type})")
 
 
-def get_raw_data_size(reader):
+def get_stripe_row_counts(local_fs, path):
     """
-    Extract raw data size from ORC file metadata.
+    Return the number of rows in each stripe from the ORC footer.
     
-    The raw data size represents the uncompressed size of the data.
+    Only the postscript and footer at the end of the file are read, so no
+    stripe data is decoded. Returns None if the footer uses a compression
+    codec that cannot be decoded locally.
+    """
+    with local_fs.open_input_file(path) as f:
+        footer = read_file_tail(f).footer()
+    
+    return parse_stripe_row_counts(footer) if footer is not None else None
+
+
+def get_content_length(reader):
+    """
+    Extract the content length from ORC file metadata.
+    
+    This is the number of bytes taken by the stripes, as recorded in the file
+    footer that the C++ ORC reader has already parsed. It is the stored
+    (compressed) size, not the raw_length reported by orc_info_collector,
+    which sums the string/binary lengths from the column statistics.
     """
     try:
-        # Try to get content length from file metadata
-        file_metadata = reader.metadata
-        if hasattr(file_metadata, 'content_length'):
-            return file_metadata.content_length
-        
-        # If content_length is not available, try to get it from statistics
-        raw_data_size = 0
-        for col_name, stats in reader.statistics.items():
-            # If bytesOnDisk is available, it's a better estimate
-            if 'bytesOnDisk' in stats:
-                raw_data_size += stats['bytesOnDisk']
-            elif 'numberOfValues' in stats:
-                # Sum the total number of values as a fallback
-                raw_data_size += stats['numberOfValues']
-        
-        return raw_data_size if raw_data_size > 0 else None
+        content_length = reader.content_length
+        return content_length if content_length > 0 else None
         
-    except (KeyError, AttributeError) as e:
-        print(f"Could not get raw data size: {e}")
+    except AttributeError as e:
+        print(f"Could not get content length: {e}")
         return None
 
 
@@ -118,7 +130,7 @@ def main():
         create_sample_orc_file(temp_path, num_rows=10000)
         
         # Analyze the file
-        analyze_local_orc_file(temp_path)
+        analyze_local_orc_file(temp_path, include_content_length=True)
     
     finally:
         # Clean up
@@ -13,14 +13,69 @@ Where <input_file> contains a list of S3 paths to ORC files, one per line.
 """
 
 import os
+import io
+import sys
+import time
 import argparse
+import functools
+import itertools
+import pyarrow as pa
+import pyarrow.csv
 from pyarrow import fs
-import pandas as pd
-from urllib.parse import urlparse
+import collections
 import concurrent.futures
+import multiprocessing
+import threading
 import logging
 from pyorc import Reader, Column
 
+from _fastpath import (
+    TAIL_READ_SIZE,
+    parse_s3_path,
+    read_file_tail,
+    _parse_footer,
+    _build_result
+)
+
+# Size of the in-memory window fetched by CoalescingReader on each S3 read
+COALESCE_WINDOW_SIZE = 8 << 20
+
+# Reads within this distance past the window are served by the same request
+COALESCE_MIN_SEEK = 1 << 20
+
+# Attempts per S3 request. Throttling, 5xx and timeout errors are retried with
+# exponential backoff and jitter; errors such as 404 fail immediately.
+S3_MAX_ATTEMPTS = 4
+
+# Default number of metadata reads kept in flight. The work is bound by S3
+# request latency, and PyArrow releases the GIL during I/O, so many more
+# threads than cores are needed to saturate S3 throughput.
+DEFAULT_WORKERS = 64
+
+# Minimum number of files handed to a worker process at a time, amortizing IPC
+# overhead; chunks are at least as large as the threads in each process
+POOL_CHUNK_SIZE = 32
+
+# Chunks kept in flight per worker process; the input is read no further ahead
+POOL_CHUNKS_PER_PROCESS = 4
+
+# Progress is logged every PROGRESS_LOG_FILES files or PROGRESS_LOG_SECONDS
+# seconds, whichever comes first, rather than once per file
+PROGRESS_LOG_FILES = 1000
+PROGRESS_LOG_SECONDS = 1.0
+
+# Maximum number of ORC metadata results kept per process, keyed by ETag
+METADATA_CACHE_SIZE = 100_000
+
+# Columns of the output table; error rows leave the metadata columns empty
+RESULT_SCHEMA = pa.schema([
+    ('file_path', pa.string()),
+    ('file_length', pa.int64()),
+    ('num_stripes', pa.int64()),
+    ('raw_length', pa.int64()),
+    ('error', pa.string())
+])
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,78 +84,269 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def parse_s3_path(s3_path):
-    """Parse an S3 path into bucket and key components."""
-    parsed = urlparse(s3_path)
-    if parsed.scheme != 's3':
-        raise ValueError(f"Not an S3 path: {s3_path}")
+@functools.lru_cache(maxsize=None)
+def _get_fs(region, endpoint=None, anonymous=False):
+    """
+    Return the shared PyArrow S3 filesystem for the given connection settings.
+    
+    S3FileSystem is thread-safe, so a single instance (and its HTTPS connection
+    pool and resolved credentials) is shared by every reader and worker thread.
+    It is cached for the lifetime of the process and should outlive any executor
+    using it. Transient S3 errors are retried by the AWS SDK so that throttled
+    files are not reported as failed.
+    """
+    return fs.S3FileSystem(
+        region=region,
+        endpoint_override=endpoint,
+        anonymous=anonymous,
+        retry_strategy=fs.AwsStandardS3RetryStrategy(max_attempts=S3_MAX_ATTEMPTS)
+    )
+
+
+class CoalescingReader(io.RawIOBase):
+    """
+    Seekable file wrapper that serves nearby reads from an in-memory window.
+    
+    ORC readers issue many small reads for the postscript, footer and stripe
+    footers, moving backwards from the end of the file. The window can be
+    seeded with bytes the caller has already read, starting at window_start.
+    On a miss this reader fetches one window of up to window_size bytes ending
+    min_seek bytes past the requested range, so the following reads are
+    served from memory.
+    """
+    
+    def __init__(self, inner, window_size=COALESCE_WINDOW_SIZE, min_seek=COALESCE_MIN_SEEK,
+                 window=b'', window_start=0):
+        super().__init__()
+        self._inner = inner
+        self._size = inner.size()
+        self._window_size = window_size
+        self._min_seek = min_seek
+        self._window_start = window_start
+        self._window = window
+        self._pos = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self._pos
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
     
-    bucket = parsed.netloc
-    key = parsed.path.lstrip('/')
-    return bucket, key
+    def readinto(self, buffer):
+        length = min(len(buffer), max(self._size - self._pos, 0))
+        if length == 0:
+            return 0
+        
+        start = self._pos - self._window_start
+        if start < 0 or start + length > len(self._window):
+            if length >= self._window_size:
+                # Too large to coalesce; read it directly
+                buffer[:length] = self._inner.read_at(length, self._pos)
+                self._pos += length
+                return length
+            
+            end = min(self._size, self._pos + length + self._min_seek)
+            self._window_start = max(0, end - self._window_size)
+            self._window = self._inner.read_at(end - self._window_start, self._window_start)
+            start = self._pos - self._window_start
+        
+        buffer[:length] = self._window[start:start + length]
+        self._pos += length
+        return length
+    
+    def close(self):
+        self._window = b''
+        self._inner.close()
+        super().close()
+
+
+class _MetadataCache:
+    """
+    Thread-safe LRU cache of parsed ORC metadata keyed by object version.
+    
+    One instance is shared by every reader in the process, so repeated lookups
+    hit it across readers and across process_file_batch calls.
+    """
+    
+    def __init__(self, maxsize):
+        self._maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_metadata_cache = _MetadataCache(METADATA_CACHE_SIZE)
 
 
 class S3ORCReader:
     """A class to read ORC file metadata from S3 efficiently using PyArrow's filesystem interface."""
     
     def __init__(self, s3_client=None):
-        # Create PyArrow S3 filesystem
-        self.s3_fs = fs.S3FileSystem(
-            region=os.environ.get('AWS_REGION', 'us-west-2')
-        )
+        # Reuse the process-wide PyArrow S3 filesystem
+        self.s3_fs = _get_fs(os.environ.get('AWS_REGION', 'us-west-2'))
     
-    def get_orc_metadata(self, bucket, key):
+    def get_orc_metadata(self, bucket, key, include_raw_data_size=False):
         """
         Get ORC file metadata using PyArrow's filesystem interface.
         
-        This method uses PyArrow's filesystem interface to:
-        1. Read the ORC file metadata
+        The postscript and footer are fetched with a single ranged read at the
+        end of the file and parsed locally. Files whose footer uses a codec
+        that cannot be decoded here (LZO) fall back to the full ORC reader on
+        the same handle, seeded with the tail already read.
+        
+        Results are cached per process, keyed by the ETag reported when the
+        file is opened, so a repeated lookup of an unchanged object costs only
+        the HEAD request. Files without an ETag, such as local files, are not
+        cached. process_file_batch already skips duplicate paths, so the cache
+        only hits when the same reader process serves several batches.
+        
+        Args:
+            bucket: S3 bucket name
+            key: Object key of the ORC file
+            include_raw_data_size: Also sum the raw string/binary length from
+                the column statistics; raw_length is None otherwise
         """
-        # Construct the full S3 path
-        s3_path = f"{bucket}/{key}"
+        try:
+            with self.s3_fs.open_input_file(f"{bucket}/{key}") as in_file:
+                etag = in_file.metadata().get(b'ETag')
+                if not etag:
+                    return self._read_metadata(in_file, include_raw_data_size)
+                
+                cache_key = (bucket, key, etag, include_raw_data_size)
+                metadata = _metadata_cache.get(cache_key)
+                if metadata is None:
+                    metadata = self._read_metadata(in_file, include_raw_data_size)
+                    _metadata_cache.put(cache_key, metadata)
+            
+            return metadata
         
+        except Exception as e:
+            logger.error(f"Error reading ORC metadata with PyArrow filesystem: {e}")
+            return None
+    
+    def warm_up(self, bucket):
+        """
+        Issue one cheap request against a bucket before workers start.
+        
+        This resolves DNS and credentials and opens the first connection once,
+        instead of every worker going through the cold path concurrently.
+        Failures are ignored; the real requests report their own errors.
+        """
         try:
-            # Get file info using PyArrow's filesystem interface
-            in_stream = self.s3_fs.open_input_file(s3_path)
-
-            # # Use PyArrow's ORC reader with the filesystem
-            # reader = orc.ORCFile(io_stream)
+            self.s3_fs.get_file_info(bucket)
+        except Exception as e:
+            logger.debug(f"S3 warm-up request for {bucket} failed: {e}")
+    
+    def _read_metadata(self, in_file, include_raw_data_size):
+        """Read ORC file metadata from an open file."""
+        file_tail = read_file_tail(in_file, TAIL_READ_SIZE)
+        metadata = self._get_metadata_from_tail(file_tail, include_raw_data_size)
+        if metadata is None:
+            metadata = self._get_metadata_with_reader(in_file, file_tail, include_raw_data_size)
+        return metadata
+    
+    def _get_metadata_from_tail(self, file_tail, include_raw_data_size=False):
+        """
+        Parse the ORC footer from the file tail locally.
+        
+        Returns:
+            dict: file_length, num_stripes and raw_length, or None if the footer
+            compression is not supported locally
+        """
+        footer = file_tail.footer()
+        if footer is None:
+            return None
+        
+        footer_info = _parse_footer(footer, include_raw_data_size)
+        
+        return {
+            'file_length': file_tail.file_length,
+            'num_stripes': footer_info['num_stripes'],
+            'raw_length': footer_info['raw_length']
+        }
+    
+    def _get_metadata_with_reader(self, in_file, file_tail, include_raw_data_size=False):
+        """Get ORC file metadata by reading an open file with the full ORC reader."""
+        # The reader needs the postscript, footer and metadata sections. Reuse
+        # the tail already read and fetch only what it is missing, sized from
+        # the postscript, so the reader is served from memory.
+        postscript = file_tail.postscript
+        window = file_tail.buffer
+        needed = (1 + postscript['postscript_length'] + postscript['footer_length']
+                  + postscript['metadata_length'])
+        if needed > file_tail.file_length:
+            raise ValueError("Metadata length exceeds file size")
+        if needed > len(window):
+            missing = needed - len(window)
+            window = in_file.read_at(missing, file_tail.file_length - needed).to_pybytes() + bytes(window)
+        
+        # ORC readers need a seekable file, so wrap the random access file
+        # rather than using a forward-only input stream.
+        with CoalescingReader(in_file, window=bytes(window),
+                              window_start=file_tail.file_length - len(window)) as in_stream:
             reader = Reader(in_stream)
             
             # Get number of stripes
-            # num_stripes = reader.nstripes
             num_stripes = reader.num_of_stripes
 
             # Get file length
-            # file_length = reader.file_length
             file_length = reader.bytes_lengths.get('file_length')
 
-            schema = reader.schema
-            col_len = len(schema.fields)
-
-            raw_length = 0
-            for idx in range(col_len):
-                col = Column(reader, idx + 1)
-                raw_length += col.statistics.get('total_length')
+            raw_length = None
+            if include_raw_data_size:
+                # Sum the top-level columns by their column ids, which skip
+                # over the children of nested types, matching the tail parser
+                raw_length = 0
+                for field in reader.schema.fields.values():
+                    col = Column(reader, field.column_id)
+                    raw_length += col.statistics.get('total_length') or 0
 
-            return {
-                'file_length': file_length,
-                'num_stripes': num_stripes,
-                'raw_length':  raw_length
-            }
-        
-        except Exception as e:
-            logger.error(f"Error reading ORC metadata with PyArrow filesystem: {e}")
-            return None
+        return {
+            'file_length': file_length,
+            'num_stripes': num_stripes,
+            'raw_length':  raw_length
+        }
 
 
-def get_orc_file_info(s3_path, s3_reader=None):
+def get_orc_file_info(s3_path, s3_reader, include_raw_data_size=False):
     """
     Get information about an ORC file without reading the entire file.
     
     Args:
         s3_path: S3 path to the ORC file
-        s3_reader: Optional S3ORCReader instance
+        s3_reader: Shared S3ORCReader instance
+        include_raw_data_size: Also collect raw_length from column statistics
         
     Returns:
         dict: Information about the ORC file
@@ -109,65 +355,198 @@ def get_orc_file_info(s3_path, s3_reader=None):
         # Parse S3 path
         bucket, key = parse_s3_path(s3_path)
         
-        # Use provided reader or create a new one
-        reader = s3_reader or S3ORCReader()
-        
         # Get metadata
-        metadata = reader.get_orc_metadata(bucket, key)
+        metadata = s3_reader.get_orc_metadata(bucket, key, include_raw_data_size)
         
         # Return combined information
+        return _build_result(s3_path, metadata)
+    
+    except Exception as e:
+        logger.error(f"Error processing {s3_path}: {e}")
         return {
             'file_path': s3_path,
-            'file_length': metadata['file_length'],
-            'num_stripes': metadata['num_stripes'],
-            'raw_length': metadata['raw_length']
+            'error': str(e)
         }
+
+
+def _iter_unique(file_paths):
+    """
+    Yield each path once, reading the input lazily.
+    
+    Duplicates are detected across the whole input, so the set of paths seen
+    so far grows with the number of unique paths.
+    """
+    seen = set()
+    for path in file_paths:
+        if path not in seen:
+            seen.add(path)
+            yield path
+
+
+# Reader and thread pool owned by the current worker process, set by _init_worker
+_worker_reader = None
+_worker_executor = None
+
+
+def _init_worker(warm_up_bucket=None, threads=1):
+    """Create the S3 reader and thread pool shared by all tasks of a worker process."""
+    global _worker_reader, _worker_executor
+    _worker_reader = S3ORCReader()
+    _worker_executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+    if warm_up_bucket:
+        _worker_reader.warm_up(warm_up_bucket)
+
+
+def _process_worker(task):
+    """Process one file in a worker process; task is (path, include_raw_data_size)."""
+    path, include_raw_data_size = task
+    return get_orc_file_info(path, _worker_reader, include_raw_data_size)
+
+
+def _process_worker_chunk(tasks):
+    """Process a chunk of files on the worker process's threads, returning results in order."""
+    return list(_worker_executor.map(_process_worker, tasks))
+
+
+def _process_with_pool(file_paths, processes, include_raw_data_size, warm_up_bucket=None,
+                       threads_per_process=1):
+    """
+    Process files with a multiprocessing pool, yielding results in input order.
+    
+    Each process holds one S3 reader and keeps up to threads_per_process S3
+    requests in flight, since a single request at a time would leave the
+    process idle waiting on S3 latency.
+    """
+    pool_tasks = ((path, include_raw_data_size) for path in file_paths)
+    chunk_size = max(POOL_CHUNK_SIZE, threads_per_process)
+    max_in_flight = processes * POOL_CHUNKS_PER_PROCESS
     
+    # Spawn fresh interpreters; the AWS SDK state in this process is not fork-safe
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=processes, initializer=_init_worker,
+                      initargs=(warm_up_bucket, threads_per_process)) as pool:
+        # FIFO of chunk results, submitted here rather than through imap, whose
+        # task handler thread would drain the whole input ahead of the workers
+        in_flight = collections.deque()
+        while True:
+            chunk = list(itertools.islice(pool_tasks, chunk_size))
+            if not chunk:
+                break
+            in_flight.append(pool.apply_async(_process_worker_chunk, (chunk,)))
+            if len(in_flight) >= max_in_flight:
+                yield from in_flight.popleft().get()
+        
+        # Drain the remaining results
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+
+def _process_with_threads(file_paths, s3_reader, max_workers, include_raw_data_size):
+    """Process files with a thread pool sharing one S3 reader, yielding results in input order."""
+    max_in_flight = max_workers * 4
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # FIFO of (path, future); results are yielded from the head so the
+        # output keeps the input order while later files are still running
+        in_flight = collections.deque()
+        for path in file_paths:
+            in_flight.append((path, executor.submit(get_orc_file_info, path, s3_reader,
+                                                    include_raw_data_size)))
+            if len(in_flight) < max_in_flight:
+                continue
+            
+            # Wait for the oldest file before reading more of the input
+            path, future = in_flight.popleft()
+            yield _future_result(future, path)
+        
+        # Drain the remaining results
+        while in_flight:
+            path, future = in_flight.popleft()
+            yield _future_result(future, path)
+
+
+def _log_progress(results):
+    """Yield results unchanged while periodically logging how many have completed."""
+    completed = 0
+    last_log = time.monotonic()
+    for info in results:
+        completed += 1
+        if completed % PROGRESS_LOG_FILES == 0 or time.monotonic() - last_log >= PROGRESS_LOG_SECONDS:
+            logger.info(f"Processed {completed} files")
+            last_log = time.monotonic()
+        yield info
+    
+    logger.info(f"Finished processing {completed} files")
+
+
+def _future_result(future, path):
+    """Return the result of a completed future, or an error result for path."""
+    try:
+        return future.result()
     except Exception as e:
-        logger.error(f"Error processing {s3_path}: {e}")
+        logger.error(f"Error processing {path}: {e}")
         return {
-            'file_path': s3_path,
+            'file_path': path,
             'error': str(e)
         }
 
 
-def process_file_batch(file_paths, max_workers=10):
-    """Process a batch of files in parallel."""
-    results = []
+def process_file_batch(file_paths, max_workers=DEFAULT_WORKERS, processes=None, include_raw_data_size=False):
+    """
+    Process files in parallel, yielding results in input order.
+    
+    file_paths may be any iterable, such as an open manifest file. It is read
+    lazily, no further ahead than the files in flight, which are bounded by
+    max_workers * 4 (or processes * POOL_CHUNKS_PER_PROCESS chunks of
+    POOL_CHUNK_SIZE files). Duplicate paths are skipped; this keeps every
+    unique path seen in memory, so memory use grows with the number of unique
+    paths.
     
+    Files are processed by a thread pool sharing one S3 reader. When processes
+    is set, a multiprocessing pool with one reader per process is used instead,
+    so local footer parsing is not serialized by the GIL. The max_workers
+    requests in flight are then split evenly across the processes.
+    
+    raw_length is only collected from the column statistics when
+    include_raw_data_size is set.
+    """
     # Create a shared S3 FS for all workers
     s3_reader = S3ORCReader()
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        future_to_path = {
-            executor.submit(get_orc_file_info, path, s3_reader): path 
-            for path in file_paths
-        }
-        
-        # Process results as they complete
-        for i, future in enumerate(concurrent.futures.as_completed(future_to_path)):
-            path = future_to_path[future]
-            try:
-                info = future.result()
-                results.append(info)
-                logger.info(f"Processed {i+1}/{len(file_paths)}: {path}")
-            except Exception as e:
-                logger.error(f"Error processing {path}: {e}")
-                results.append({
-                    'file_path': path,
-                    'error': str(e)
-                })
+    # Warm up the S3 client against the first file's bucket before any
+    # worker starts, so the cold-start cost is paid once
+    file_paths = iter(file_paths)
+    first_path = next(file_paths, None)
+    warm_up_bucket = None
+    if first_path is not None:
+        file_paths = itertools.chain([first_path], file_paths)
+        try:
+            warm_up_bucket, _ = parse_s3_path(first_path)
+        except ValueError:
+            pass
+    if warm_up_bucket:
+        s3_reader.warm_up(warm_up_bucket)
     
-    return results
+    file_paths = _iter_unique(file_paths)
+    
+    if processes:
+        threads_per_process = max(1, max_workers // processes)
+        yield from _log_progress(_process_with_pool(file_paths, processes, include_raw_data_size,
+                                                    warm_up_bucket, threads_per_process))
+    else:
+        yield from _log_progress(_process_with_threads(file_paths, s3_reader, max_workers, include_raw_data_size))
 
 
 def main():
     parser = argparse.ArgumentParser(description='Collect information about ORC files on S3')
     parser.add_argument('input_file', help='File containing a list of S3 paths to ORC files')
     parser.add_argument('--output', '-o', help='Output file path (default: stdout)')
-    parser.add_argument('--workers', '-w', type=int, default=10, 
-                        help='Number of worker threads (default: 10)')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS, 
+                        help=f'Number of S3 requests kept in flight (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--processes', '-p', type=int,
+                        help='Number of worker processes; when set, the --workers requests in flight '
+                             'are split across the processes')
+    parser.add_argument('--raw-length', action='store_true',
+                        help='Also collect the raw string/binary length from column statistics')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='Enable verbose logging')
     args = parser.parse_args()
@@ -176,24 +555,27 @@ def main():
     if args.verbose:
         logger.setLevel(logging.DEBUG)
     
-    # Read the list of ORC files
-    with open(args.input_file, 'r') as f:
-        orc_files = [line.strip() for line in f if line.strip()]
-    
-    logger.info(f"Processing {len(orc_files)} ORC files with {args.workers} workers")
+    logger.info(f"Processing ORC files from {args.input_file} with {args.workers} workers")
     
-    # Process files in parallel
-    results = process_file_batch(orc_files, max_workers=args.workers)
-    
-    # Convert to DataFrame for easier handling
-    df = pd.DataFrame(results)
+    # Stream the list of ORC files through the workers
+    with open(args.input_file, 'r') as f:
+        orc_files = (line.strip() for line in f if line.strip())
+        results = process_file_batch(orc_files, max_workers=args.workers, processes=args.processes,
+                                     include_raw_data_size=args.raw_length)
+        
+        output = args.output
+        if output is None:
+            sys.stdout.flush()
+            output = sys.stdout.buffer
+        
+        # Write each result as soon as it completes, so the output can be
+        # followed while the tool runs and results are not held in memory
+        with pa.csv.CSVWriter(output, RESULT_SCHEMA) as writer:
+            for info in results:
+                writer.write_batch(pa.RecordBatch.from_pylist([info], schema=RESULT_SCHEMA))
     
-    # Output results
     if args.output:
-        df.to_csv(args.output, index=False)
         logger.info(f"Results saved to {args.output}")
-    else:
-        print(df.to_string())
 
 
 if __name__ == "__main__":
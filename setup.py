@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Install the ORC File Information Collector.
+
+When mypyc is available, the per-file hot path in _fastpath.py is compiled to
+a C extension; otherwise the pure-Python module is installed as is.
+"""
+
+from setuptools import setup
+
+try:
+    from mypyc.build import mypycify
+    ext_modules = mypycify(['--strict', '_fastpath.py'])
+except ImportError:
+    ext_modules = []
+
+setup(
+    name='orc-file-info',
+    version='0.1.0',
+    description='Collect information about ORC files stored on S3',
+    py_modules=['orc_info_collector', '_fastpath'],
+    ext_modules=ext_modules,
+    install_requires=[
+        'pyorc~=0.10.0',
+        'pyarrow~=20.0.0'
+    ],
+    entry_points={
+        'console_scripts': ['orc-info-collector=orc_info_collector:main']
+    }
+)
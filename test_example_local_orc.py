@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the local ORC file example
+"""
+
+import unittest
+from unittest.mock import patch
+import io
+import tempfile
+import os
+import pyarrow as pa
+import pyarrow.orc as orc
+from pyarrow import fs
+
+# Import the module
+from example_local_orc import analyze_local_orc_file, get_stripe_row_counts
+
+
+class TestExampleLocalORC(unittest.TestCase):
+
+    def _write_table(self, path, compression, num_rows=5000):
+        """Write a sample table to an ORC file with small stripes."""
+        table = pa.table({'id': list(range(num_rows)), 'name': [f'name_{i}' for i in range(num_rows)]})
+        orc.write_table(table, path, stripe_size=1024 * 10, compression=compression)
+    
+    def test_get_stripe_row_counts(self):
+        """Test reading per-stripe row counts from the file footer."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for compression in ('uncompressed', 'zlib', 'snappy', 'lz4', 'zstd'):
+                path = os.path.join(tmp_dir, f'{compression}.orc')
+                self._write_table(path, compression)
+                orc_file = orc.ORCFile(path)
+                
+                row_counts = get_stripe_row_counts(fs.LocalFileSystem(), path)
+                
+                self.assertEqual(len(row_counts), orc_file.nstripes)
+                self.assertEqual(sum(row_counts), 5000)
+                self.assertEqual(row_counts[0], orc_file.read_stripe(0).num_rows)
+                if compression == 'uncompressed':
+                    self.assertGreater(len(row_counts), 1)
+    
+    def test_analyze_local_orc_file_prints_stripe_rows(self):
+        """Test that stripe row counts are printed for files of any codec."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'file.orc')
+            self._write_table(path, 'snappy', num_rows=100)
+            
+            with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                analyze_local_orc_file(path, include_content_length=True)
+            
+            self.assertIn("Stripe 0: 100 rows", stdout.getvalue())
+            self.assertIn("Content length (stripe bytes):", stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,19 +9,43 @@ import io
 import tempfile
 import os
 import sys
+import time
+import threading
 import pandas as pd
+import pyarrow as pa
+import pyarrow.orc as orc
+from pyarrow import fs
+from pyorc import Writer, Reader, CompressionKind
+
+from _fastpath import TAIL_READ_SIZE, FileTail
 
 # Import the module
 from orc_info_collector import (
     parse_s3_path, 
     get_orc_file_info, 
     S3ORCReader,
-    process_file_batch
+    process_file_batch,
+    _get_fs,
+    _metadata_cache,
+    _init_worker,
+    _process_worker,
+    _process_worker_chunk,
+    CoalescingReader,
+    main
 )
 
 
 class TestORCInfoCollector(unittest.TestCase):
     
+    def setUp(self):
+        # Keep batch tests from contacting S3 through the warm-up request
+        self.warm_up_patcher = patch.object(S3ORCReader, 'warm_up')
+        self.mock_warm_up = self.warm_up_patcher.start()
+        self.addCleanup(self.warm_up_patcher.stop)
+        
+        # Start every test with an empty process-wide metadata cache
+        _metadata_cache.clear()
+    
     def test_parse_s3_path(self):
         """Test parsing S3 paths into bucket and key components."""
         # Test valid S3 path
@@ -29,122 +53,281 @@ class TestORCInfoCollector(unittest.TestCase):
         self.assertEqual(bucket, 'my-bucket')
         self.assertEqual(key, 'path/to/file.orc')
         
+        # Test keys containing URL special characters
+        self.assertEqual(parse_s3_path('s3://my-bucket/dt=2024-01-01/part#1?.orc'),
+                         ('my-bucket', 'dt=2024-01-01/part#1?.orc'))
+        
+        # Test bucket-only path
+        self.assertEqual(parse_s3_path('s3://my-bucket'), ('my-bucket', ''))
+        
         # Test invalid S3 path
         with self.assertRaises(ValueError):
             parse_s3_path('http://example.com/file.orc')
     
-    @patch('pyarrow.fs.S3FileSystem')
-    def test_s3_orc_reader_with_pyarrow_fs(self, mock_s3_fs):
-        """Test the S3ORCReader class with PyArrow filesystem."""
-        # Mock S3 client
-        mock_s3 = MagicMock()
-        
-        # Mock PyArrow S3 filesystem
-        mock_fs_instance = MagicMock()
-        mock_s3_fs.return_value = mock_fs_instance
-        
-        # Mock file info
-        mock_file_info = MagicMock()
-        mock_file_info.size = 10240  # 10KB file
-        mock_fs_instance.get_file_info.return_value = mock_file_info
-        
-        # Create a mock ORC file reader
-        with patch('pyarrow.orc.ORCFile') as mock_orc_file:
-            mock_orc_instance = MagicMock()
-            mock_orc_instance.nstripes = 3
-            
-            # Mock metadata with content_length
-            mock_metadata = MagicMock()
-            mock_metadata.content_length = 5000
-            mock_orc_instance.metadata = mock_metadata
-            
-            # Mock statistics as fallback
-            mock_orc_instance.statistics = {
-                'col1': {'numberOfValues': 100, 'bytesOnDisk': 2000},
-                'col2': {'numberOfValues': 200, 'bytesOnDisk': 3000}
-            }
-            mock_orc_file.return_value = mock_orc_instance
-            
-            # Create the reader and get metadata
-            reader = S3ORCReader(mock_s3)
-            metadata = reader.get_orc_metadata('my-bucket', 'path/to/file.orc')
-            
-            # Verify the result
-            self.assertEqual(metadata['file_length'], 10240)
-            self.assertEqual(metadata['num_stripes'], 3)
-            self.assertEqual(metadata['raw_data_size'], 5000)  # Should use content_length
-            
-            # Verify PyArrow filesystem calls
-            mock_fs_instance.get_file_info.assert_called_once_with('s3://my-bucket/path/to/file.orc')
-            mock_orc_file.assert_called_once_with('s3://my-bucket/path/to/file.orc', filesystem=mock_fs_instance)
-    
-    @patch('boto3.client')
-    def test_s3_orc_reader_legacy(self, mock_boto3_client):
-        """Test the S3ORCReader class with legacy method."""
-        # Mock S3 client
-        mock_s3 = MagicMock()
-        mock_boto3_client.return_value = mock_s3
-        
-        # Mock head_object response
-        mock_s3.head_object.return_value = {
-            'ContentLength': 10240  # 10KB file
-        }
-        
-        # Mock get_object response for the end of the file
-        mock_end_body = MagicMock()
-        # Create a mock postscript and footer
-        mock_end_data = bytearray(8192)
-        # Set the postscript size (last byte)
-        mock_end_data[-1] = 20
-        mock_end_body.read.return_value = bytes(mock_end_data)
-        mock_s3.get_object.return_value = {
-            'Body': mock_end_body
-        }
-        
-        # Create a mock ORC file reader
-        with patch('pyarrow.orc.ORCFile') as mock_orc_file:
-            mock_orc_instance = MagicMock()
-            mock_orc_instance.nstripes = 3
-            mock_orc_instance.statistics = {
-                'col1': {'numberOfValues': 100},
-                'col2': {'numberOfValues': 200}
-            }
-            mock_orc_file.return_value = mock_orc_instance
+    def _make_local_reader(self, tmp_dir):
+        """Create an S3ORCReader backed by a local directory instead of S3."""
+        reader = S3ORCReader()
+        reader.s3_fs = fs.SubTreeFileSystem(tmp_dir, fs.LocalFileSystem())
+        return reader
+    
+    def _write_orc_file(self, path, num_rows=5000, compression=CompressionKind.ZLIB):
+        """Write a multi-stripe ORC file with string, int and binary columns."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            writer = Writer(f, "struct<id:int,name:string,payload:binary>",
+                            stripe_size=4096, compression=compression)
+            for i in range(num_rows):
+                writer.write((i, f'name_{i}', b'x' * (i % 5)))
+            writer.close()
+    
+    def test_s3_orc_reader_reads_tail(self):
+        """Test that metadata is parsed from the file tail without the ORC reader."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'my-bucket', 'path', 'to', 'file.orc')
+            self._write_orc_file(path)
+            reader = self._make_local_reader(tmp_dir)
+            
+            with patch('orc_info_collector.Reader') as mock_orc_reader:
+                metadata = reader.get_orc_metadata('my-bucket', 'path/to/file.orc',
+                                                   include_raw_data_size=True)
+                mock_orc_reader.assert_not_called()
+            
+            with open(path, 'rb') as f:
+                expected = Reader(f)
+                self.assertEqual(metadata['file_length'], os.path.getsize(path))
+                self.assertEqual(metadata['num_stripes'], expected.num_of_stripes)
+                self.assertEqual(metadata['raw_length'],
+                                 sum(len(f'name_{i}') + i % 5 for i in range(5000)))
+    
+    def test_s3_orc_reader_skips_raw_data_size_by_default(self):
+        """Test that raw_length is only collected when requested."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for compression in (CompressionKind.ZLIB, CompressionKind.SNAPPY):
+                path = os.path.join(tmp_dir, 'my-bucket', f'{compression.name}.orc')
+                self._write_orc_file(path, compression=compression)
+                reader = self._make_local_reader(tmp_dir)
+                
+                metadata = reader.get_orc_metadata('my-bucket', f'{compression.name}.orc')
+                self.assertIsNone(metadata['raw_length'])
+                self.assertEqual(metadata['file_length'], os.path.getsize(path))
+                
+                metadata = reader.get_orc_metadata('my-bucket', f'{compression.name}.orc',
+                                                   include_raw_data_size=True)
+                self.assertEqual(metadata['raw_length'],
+                                 sum(len(f'name_{i}') + i % 5 for i in range(5000)))
+    
+    def test_s3_orc_reader_rereads_large_footer(self):
+        """Test that footers larger than the initial tail read are fetched again."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'my-bucket', 'file.orc')
+            self._write_orc_file(path, compression=CompressionKind.NONE)
+            reader = self._make_local_reader(tmp_dir)
+            
+            expected = reader.get_orc_metadata('my-bucket', 'file.orc')
+            self.assertGreater(expected['num_stripes'], 1)
+            with patch('orc_info_collector.TAIL_READ_SIZE', 256):
+                metadata = reader.get_orc_metadata('my-bucket', 'file.orc')
+            
+            self.assertEqual(metadata, expected)
+    
+    def test_s3_orc_reader_decodes_footer_codecs_locally(self):
+        """Test that Snappy, LZ4 and ZSTD footers are parsed without the ORC reader."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            reader = self._make_local_reader(tmp_dir)
+            for compression in (CompressionKind.SNAPPY, CompressionKind.LZ4, CompressionKind.ZSTD):
+                path = os.path.join(tmp_dir, 'my-bucket', f'{compression.name}.orc')
+                self._write_orc_file(path, compression=compression)
+                
+                with patch('orc_info_collector.Reader') as mock_orc_reader:
+                    metadata = reader.get_orc_metadata('my-bucket', f'{compression.name}.orc',
+                                                       include_raw_data_size=True)
+                    mock_orc_reader.assert_not_called()
+                
+                with open(path, 'rb') as f:
+                    self.assertEqual(metadata['num_stripes'], Reader(f).num_of_stripes)
+                self.assertEqual(metadata['file_length'], os.path.getsize(path))
+                self.assertEqual(metadata['raw_length'],
+                                 sum(len(f'name_{i}') + i % 5 for i in range(5000)))
+    
+    @patch.object(FileTail, 'footer', return_value=None)
+    def test_s3_orc_reader_falls_back_for_unsupported_compression(self, mock_footer):
+        """Test that footers with codecs not decoded locally use the ORC reader on the tail already read."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'my-bucket', 'file.orc')
+            self._write_orc_file(path, num_rows=50000, compression=CompressionKind.SNAPPY)
+            self.assertGreater(os.path.getsize(path), TAIL_READ_SIZE)
+            reader = self._make_local_reader(tmp_dir)
+            local_fs = reader.s3_fs
+            read_sizes = []
+            
+            def open_input_file(fs_path):
+                in_file = MagicMock(wraps=local_fs.open_input_file(fs_path))
+                in_file.__enter__.return_value = in_file
+                in_file.read_at.side_effect = lambda length, offset: (
+                    read_sizes.append(length) or local_fs.open_input_file(fs_path).read_at(length, offset))
+                return in_file
+            
+            reader.s3_fs = MagicMock(wraps=local_fs)
+            reader.s3_fs.open_input_file.side_effect = open_input_file
+            metadata = reader.get_orc_metadata('my-bucket', 'file.orc')
+            
+            mock_footer.assert_called_once()
+            self.assertEqual(metadata['file_length'], os.path.getsize(path))
+            with open(path, 'rb') as f:
+                self.assertEqual(metadata['num_stripes'], Reader(f).num_of_stripes)
             
-            # Force legacy method by making PyArrow filesystem fail
-            with patch('pyarrow.fs.S3FileSystem', side_effect=Exception("Forced failure")):
-                # Create the reader and get metadata
-                reader = S3ORCReader(mock_s3)
-                metadata = reader._legacy_get_metadata('my-bucket', 'path/to/file.orc')
+            # The ORC reader is served from the 64 KiB tail read
+            self.assertEqual(read_sizes, [TAIL_READ_SIZE])
+    
+    def test_s3_orc_reader_raw_length_of_nested_schema(self):
+        """Test that raw_length sums the same top-level columns with and without the ORC reader."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, 'my-bucket'))
+            reader = self._make_local_reader(tmp_dir)
+            for compression in (CompressionKind.ZLIB, CompressionKind.SNAPPY):
+                path = os.path.join(tmp_dir, 'my-bucket', f'{compression.name}.orc')
+                with open(path, 'wb') as f:
+                    writer = Writer(f, "struct<a:struct<x:string>,b:string>", compression=compression)
+                    for i in range(100):
+                        writer.write((('xx',), 'yyyyyyyyyy'))
+                    writer.close()
+                
+                local = reader.get_orc_metadata('my-bucket', f'{compression.name}.orc',
+                                                include_raw_data_size=True)
+                with patch.object(FileTail, 'footer', return_value=None):
+                    fallback = reader.get_orc_metadata('my-bucket', f'{compression.name}.orc',
+                                                       include_raw_data_size=True)
+                
+                # The nested struct has no string statistics of its own
+                self.assertEqual(local['raw_length'], 1000)
+                self.assertEqual(fallback['raw_length'], 1000)
+    
+    def test_s3_orc_reader_caches_metadata(self):
+        """Test that unchanged files are only read once, across readers."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'my-bucket', 'file.orc')
+            self._write_orc_file(path)
+            etag = {'value': b'"v1"'}
+            
+            def make_reader():
+                # Report an ETag as S3 does; the local filesystem has none
+                reader = self._make_local_reader(tmp_dir)
+                local_fs = reader.s3_fs
+                
+                def open_input_file(fs_path):
+                    in_file = MagicMock(wraps=local_fs.open_input_file(fs_path))
+                    in_file.__enter__.return_value = in_file
+                    in_file.metadata.return_value = {b'ETag': etag['value']}
+                    return in_file
+                
+                reader.s3_fs = MagicMock(wraps=local_fs)
+                reader.s3_fs.open_input_file.side_effect = open_input_file
+                return reader
+            
+            reader = make_reader()
+            with patch.object(S3ORCReader, '_get_metadata_from_tail', autospec=True,
+                              side_effect=S3ORCReader._get_metadata_from_tail) as mock_tail:
+                first = reader.get_orc_metadata('my-bucket', 'file.orc')
+                second = make_reader().get_orc_metadata('my-bucket', 'file.orc')
+                self.assertEqual(first, second)
+                self.assertEqual(mock_tail.call_count, 1)
                 
-                # Verify the result
-                self.assertEqual(metadata['file_length'], 10240)
-                self.assertEqual(metadata['num_stripes'], 3)
+                # The cache key comes from the open file rather than a separate HEAD
+                reader.s3_fs.get_file_info.assert_not_called()
                 
-                # Verify S3 client calls
-                mock_s3.head_object.assert_called_once_with(Bucket='my-bucket', Key='path/to/file.orc')
-                mock_s3.get_object.assert_called_once()
+                # A rewritten object gets a new ETag and is read again
+                self._write_orc_file(path, num_rows=10)
+                etag['value'] = b'"v2"'
+                third = reader.get_orc_metadata('my-bucket', 'file.orc')
+                self.assertEqual(mock_tail.call_count, 2)
+                self.assertEqual(third['file_length'], os.path.getsize(path))
+    
+    def test_s3_orc_reader_skips_cache_without_etag(self):
+        """Test that files without an ETag are read on every lookup."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._write_orc_file(os.path.join(tmp_dir, 'my-bucket', 'file.orc'))
+            reader = self._make_local_reader(tmp_dir)
+            
+            # A same-size rewrite would not be detected by the size alone
+            with patch.object(reader, '_get_metadata_from_tail',
+                              wraps=reader._get_metadata_from_tail) as mock_tail:
+                reader.get_orc_metadata('my-bucket', 'file.orc')
+                reader.get_orc_metadata('my-bucket', 'file.orc')
+                self.assertEqual(mock_tail.call_count, 2)
+    
+    def test_coalescing_reader_serves_nearby_reads(self):
+        """Test that reads near the last window are served from memory."""
+        data = bytes(range(256)) * 4
+        inner = MagicMock()
+        inner.size.return_value = len(data)
+        inner.read_at.side_effect = lambda length, offset: data[offset:offset + length]
+        
+        with CoalescingReader(inner, window_size=256, min_seek=32) as reader:
+            reader.seek(-16, io.SEEK_END)
+            self.assertEqual(reader.read(16), data[-16:])
+            reader.seek(len(data) - 200)
+            self.assertEqual(reader.read(100), data[-200:-100])
+            self.assertEqual(inner.read_at.call_count, 1)
+            
+            # A read outside the window fetches a new window around it
+            reader.seek(10)
+            self.assertEqual(reader.read(20), data[10:30])
+            self.assertEqual(reader.read(20), data[30:50])
+            self.assertEqual(inner.read_at.call_count, 2)
+            
+            # Reads larger than the window bypass it
+            reader.seek(0)
+            self.assertEqual(reader.read(), data)
+            self.assertEqual(reader.read(), b'')
+        
+        inner.close.assert_called_once()
     
-    @patch('orc_info_collector.S3ORCReader')
-    def test_get_orc_file_info(self, mock_s3_orc_reader):
+    def test_s3_orc_reader_invalid_file(self):
+        """Test that non-ORC files produce no metadata."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, 'my-bucket'))
+            with open(os.path.join(tmp_dir, 'my-bucket', 'file.orc'), 'wb') as f:
+                f.write(b'not an orc file')
+            reader = self._make_local_reader(tmp_dir)
+            
+            self.assertIsNone(reader.get_orc_metadata('my-bucket', 'file.orc'))
+    
+    def test_get_orc_file_info(self):
         """Test getting ORC file information."""
         # Mock S3ORCReader
         mock_reader_instance = MagicMock()
         mock_reader_instance.get_orc_metadata.return_value = {
             'file_length': 1024,
             'num_stripes': 3,
-            'raw_data_size': 300
+            'raw_length': 300
         }
-        mock_s3_orc_reader.return_value = mock_reader_instance
         
         # Call the function
-        result = get_orc_file_info('s3://my-bucket/path/to/file.orc')
+        result = get_orc_file_info('s3://my-bucket/path/to/file.orc', mock_reader_instance)
         
         # Verify the result
         self.assertEqual(result['file_path'], 's3://my-bucket/path/to/file.orc')
         self.assertEqual(result['file_length'], 1024)
         self.assertEqual(result['num_stripes'], 3)
-        self.assertEqual(result['raw_data_size'], 300)
+        self.assertEqual(result['raw_length'], 300)
+        mock_reader_instance.get_orc_metadata.assert_called_once_with('my-bucket', 'path/to/file.orc', False)
+    
+    @patch('pyarrow.fs.S3FileSystem')
+    def test_s3_filesystem_is_shared(self, mock_s3_fs):
+        """Test that readers share a single cached S3 filesystem."""
+        _get_fs.cache_clear()
+        try:
+            first = S3ORCReader()
+            second = S3ORCReader()
+            
+            self.assertIs(first.s3_fs, second.s3_fs)
+            mock_s3_fs.assert_called_once()
+            
+            # Transient errors are retried by the filesystem
+            retry_strategy = mock_s3_fs.call_args.kwargs['retry_strategy']
+            self.assertIsInstance(retry_strategy, fs.AwsStandardS3RetryStrategy)
+        finally:
+            _get_fs.cache_clear()
     
     @patch('orc_info_collector.get_orc_file_info')
     def test_process_file_batch(self, mock_get_info):
@@ -166,56 +349,245 @@ class TestORCInfoCollector(unittest.TestCase):
         ]
         
         # Process a batch of files
-        results = process_file_batch(['s3://bucket/file1.orc', 's3://bucket/file2.orc'], max_workers=2)
+        results = list(process_file_batch(['s3://bucket/file1.orc', 's3://bucket/file2.orc'], max_workers=2))
         
         # Verify the results
         self.assertEqual(len(results), 2)
         self.assertEqual(results[0]['file_path'], 's3://bucket/file1.orc')
         self.assertEqual(results[1]['file_path'], 's3://bucket/file2.orc')
+    
+    @patch('orc_info_collector.get_orc_file_info')
+    def test_process_file_batch_skips_duplicates(self, mock_get_info):
+        """Test that duplicate paths are only processed once."""
+        mock_get_info.side_effect = lambda path, reader, include_raw_data_size=False: {
+            'file_path': path
+        }
+        
+        results = list(process_file_batch(
+            ['s3://bucket/file1.orc', 's3://bucket/file2.orc', 's3://bucket/file1.orc'],
+            max_workers=2
+        ))
+        
+        self.assertEqual(mock_get_info.call_count, 2)
+        self.assertFalse(any('error' in r for r in results))
+        self.assertEqual(sorted(r['file_path'] for r in results),
+                         ['s3://bucket/file1.orc', 's3://bucket/file2.orc'])
+
+
+    @patch('orc_info_collector.get_orc_file_info')
+    def test_process_file_batch_preserves_order(self, mock_get_info):
+        """Test that results follow the input order even when later files finish first."""
+        def get_info(path, reader, include_raw_data_size=False):
+            # Earlier files take longer to complete
+            time.sleep(0.01 * (5 - int(path[-5])))
+            return {'file_path': path}
+        mock_get_info.side_effect = get_info
+        paths = [f's3://bucket/file{i}.orc' for i in range(5)]
+        
+        results = list(process_file_batch(paths, max_workers=5))
+        
+        self.assertFalse(any('error' in r for r in results))
+        self.assertEqual([r['file_path'] for r in results], paths)
+    
+    @patch('orc_info_collector.get_orc_file_info')
+    def test_process_file_batch_bounds_in_flight(self, mock_get_info):
+        """Test that the input is read lazily with a bounded number of files in flight."""
+        mock_get_info.side_effect = lambda path, reader, include_raw_data_size=False: {
+            'file_path': path
+        }
+        consumed = []
+        
+        def paths():
+            for i in range(100):
+                consumed.append(i)
+                yield f's3://bucket/file{i}.orc'
+        
+        results = process_file_batch(paths(), max_workers=1)
+        first = next(results)
+        
+        self.assertEqual(first, {'file_path': 's3://bucket/file0.orc'})
+        self.assertLess(len(consumed), 100)
+        rest = list(results)
+        self.assertEqual(len(rest), 99)
+        self.assertFalse(any('error' in r for r in rest))
+    
+    @patch('orc_info_collector.PROGRESS_LOG_FILES', 10)
+    @patch('orc_info_collector.get_orc_file_info')
+    def test_process_file_batch_batches_progress_logging(self, mock_get_info):
+        """Test that progress is logged per batch of files rather than per file."""
+        mock_get_info.side_effect = lambda path, reader, include_raw_data_size=False: {
+            'file_path': path
+        }
+        paths = [f's3://bucket/file{i}.orc' for i in range(25)]
+        
+        with self.assertLogs('orc_info_collector', level='INFO') as logs:
+            results = list(process_file_batch(paths, max_workers=2))
+        
+        self.assertEqual(len(results), 25)
+        self.assertEqual(logs.output, [
+            'INFO:orc_info_collector:Processed 10 files',
+            'INFO:orc_info_collector:Processed 20 files',
+            'INFO:orc_info_collector:Finished processing 25 files'
+        ])
+    
+    @patch('orc_info_collector.get_orc_file_info')
+    def test_process_file_batch_warms_up_once(self, mock_get_info):
+        """Test that the S3 client is warmed up once before files are processed."""
+        calls = []
+        self.mock_warm_up.side_effect = lambda bucket: calls.append(('warm_up', bucket))
+        mock_get_info.side_effect = lambda path, *args: calls.append(('get_info', path)) or {'file_path': path}
+        
+        results = list(process_file_batch(['s3://bucket/file1.orc', 's3://bucket/file2.orc'], max_workers=2))
+        
+        self.assertEqual(len(results), 2)
+        self.mock_warm_up.assert_called_once_with('bucket')
+        self.assertEqual(calls[0], ('warm_up', 'bucket'))
+    
+    def test_warm_up_ignores_errors(self):
+        """Test that a failed warm-up request does not raise."""
+        self.warm_up_patcher.stop()
+        reader = S3ORCReader()
+        reader.s3_fs = MagicMock()
+        reader.s3_fs.get_file_info.side_effect = OSError("Could not resolve host")
+        
+        reader.warm_up('my-bucket')
+        
+        reader.s3_fs.get_file_info.assert_called_once_with('my-bucket')
+    
+    @patch('orc_info_collector.get_orc_file_info')
+    def test_process_worker(self, mock_get_info):
+        """Test the process pool worker passes its reader and options."""
+        mock_get_info.return_value = {'file_path': 's3://bucket/file1.orc'}
+        
+        _init_worker()
+        result = _process_worker(('s3://bucket/file1.orc', True))
+        
+        self.assertEqual(result['file_path'], 's3://bucket/file1.orc')
+        path, reader, include_raw_data_size = mock_get_info.call_args[0]
+        self.assertEqual(path, 's3://bucket/file1.orc')
+        self.assertIsInstance(reader, S3ORCReader)
+        self.assertTrue(include_raw_data_size)
+    
+    @patch('orc_info_collector.get_orc_file_info')
+    def test_process_worker_chunk_runs_files_concurrently(self, mock_get_info):
+        """Test that a worker process keeps several files of its chunk in flight."""
+        barrier = threading.Barrier(4, timeout=5)
+        
+        def get_info(path, reader, include_raw_data_size=False):
+            # Only returns once all four files are in flight at the same time
+            barrier.wait()
+            return {'file_path': path}
+        mock_get_info.side_effect = get_info
+        paths = [f's3://bucket/file{i}.orc' for i in range(4)]
+        
+        _init_worker(threads=4)
+        results = _process_worker_chunk([(path, False) for path in paths])
+        
+        self.assertEqual(results, [{'file_path': path} for path in paths])
+    
+    def test_process_file_batch_with_processes(self):
+        """Test processing a batch with a process pool."""
+        results = list(process_file_batch(['not-an-s3-path-1', 'not-an-s3-path-2'], processes=2))
+        
+        self.assertEqual(sorted(r['file_path'] for r in results),
+                         ['not-an-s3-path-1', 'not-an-s3-path-2'])
+        self.assertTrue(all('error' in r for r in results))
+    
+    @patch('orc_info_collector.POOL_CHUNK_SIZE', 2)
+    def test_process_file_batch_with_processes_bounds_in_flight(self):
+        """Test that the process pool reads the input lazily and keeps the input order."""
+        consumed = []
+        
+        def paths():
+            for i in range(200):
+                consumed.append(i)
+                yield f'not-an-s3-path-{i}'
+        
+        results = process_file_batch(paths(), max_workers=2, processes=1)
+        first = next(results)
+        
+        self.assertEqual(first['file_path'], 'not-an-s3-path-0')
+        self.assertLess(len(consumed), 200)
+        self.assertEqual([r['file_path'] for r in results],
+                         [f'not-an-s3-path-{i}' for i in range(1, 200)])
 
 
 class TestCommandLineInterface(unittest.TestCase):
     
-    @patch('orc_info_collector.process_file_batch')
-    def test_main_function(self, mock_process_batch):
-        """Test the main function with a sample input file."""
-        # Mock the process_file_batch function
-        mock_process_batch.return_value = [
+    def setUp(self):
+        self.results = [
             {
                 'file_path': 's3://bucket/file1.orc',
                 'file_length': 1024,
                 'num_stripes': 3,
-                'raw_data_size': 300
+                'raw_length': 300
             },
             {
                 'file_path': 's3://bucket/file2.orc',
-                'file_length': 2048,
-                'num_stripes': 5,
-                'raw_data_size': 500
+                'error': 'File not found'
             }
         ]
+        self.expected_csv = (
+            '"file_path","file_length","num_stripes","raw_length","error"\n'
+            '"s3://bucket/file1.orc",1024,3,300,\n'
+            '"s3://bucket/file2.orc",,,,"File not found"\n'
+        )
         
         # Create a temporary input file
         with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
             f.write('s3://bucket/file1.orc\n')
             f.write('s3://bucket/file2.orc\n')
-            temp_filename = f.name
+            self.input_file = f.name
+    
+    def tearDown(self):
+        # Clean up the temporary file
+        os.unlink(self.input_file)
+    
+    @patch('orc_info_collector.process_file_batch')
+    def test_main_function(self, mock_process_batch):
+        """Test the main function writes CSV to stdout."""
+        mock_process_batch.return_value = self.results
+        stdout = io.TextIOWrapper(io.BytesIO())
         
-        try:
-            # Run the main function with the temporary file
-            with patch('sys.argv', ['orc_info_collector.py', temp_filename]):
-                with patch('pandas.DataFrame.to_string', return_value='mocked_output'):
-                    with patch('builtins.print') as mock_print:
-                        from orc_info_collector import main
-                        main()
-                        
-                        # Check that print was called with the DataFrame output
-                        mock_print.assert_called_with('mocked_output')
+        # Run the main function with the temporary file
+        with patch('sys.argv', ['orc_info_collector.py', self.input_file]):
+            with patch('sys.stdout', stdout):
+                main()
         
-        finally:
-            # Clean up the temporary file
-            os.unlink(temp_filename)
+        self.assertEqual(stdout.buffer.getvalue().decode(), self.expected_csv)
+    
+    @patch('orc_info_collector.process_file_batch')
+    def test_main_function_output_file(self, mock_process_batch):
+        """Test the main function writes CSV to the output file."""
+        mock_process_batch.return_value = self.results
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, 'results.csv')
+            with patch('sys.argv', ['orc_info_collector.py', self.input_file, '-o', output_file]):
+                main()
+            
+            with open(output_file) as f:
+                self.assertEqual(f.read(), self.expected_csv)
 
+    
+    def test_main_function_writes_incrementally(self):
+        """Test that each result is in the output file before the next one completes."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, 'results.csv')
+            written = []
+            
+            def results(*args, **kwargs):
+                for info in self.results:
+                    yield info
+                    with open(output_file) as f:
+                        written.append(f.read())
+            
+            with patch('orc_info_collector.process_file_batch', side_effect=results):
+                with patch('sys.argv', ['orc_info_collector.py', self.input_file, '-o', output_file]):
+                    main()
+            
+            self.assertIn('"s3://bucket/file1.orc",1024,3,300', written[0])
+            self.assertNotIn('file2', written[0])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file